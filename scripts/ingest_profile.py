@@ -0,0 +1,170 @@
+import cProfile
+import json
+import os
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+from contextlib import contextmanager
+
+STAGES = ["extract", "chunk", "hash", "embed", "upsert", "compare"]
+
+
+def progress(iterable, total: int, label: str, enabled: bool = True):
+    """
+    진행률 표시줄을 stderr에 그리면서 iterable을 그대로 반환.
+    enabled=False이면 아무것도 출력하지 않음.
+    """
+    if not enabled or total <= 0:
+        yield from iterable
+        return
+    width = 30
+    last_drawn = -1
+    for i, item in enumerate(iterable, 1):
+        yield item
+        percent = i * 100 // total
+        if percent != last_drawn or i == total:
+            filled = width * i // total
+            sys.stderr.write(f"\r{label} [{'#' * filled}{'.' * (width - filled)}] {i}/{total}")
+            sys.stderr.flush()
+            last_drawn = percent
+    sys.stderr.write("\n")
+
+
+class StageProfiler:
+    """
+    ingest 단계별(extract, chunk, hash, embed, upsert, compare) 소요 시간과 카운터 집계.
+    profile=True이면 단계별 cProfile 통계와 tracemalloc 메모리(PDF 처리 구간 최대치, 단계별 증가분)도 수집하고
+    PDF마다 요약(summary.json)과 flamegraph 도구(snakeviz, flameprof 등)에서 열 수 있는 .prof 파일을 저장.
+    profile 모드의 시간/처리량 값에는 cProfile과 tracemalloc 오버헤드가 포함되므로 일반 실행과 비교하지 말 것.
+    """
+
+    def __init__(self, profile: bool = False, output_dir: str = "profiles"):
+        self.profile = profile
+        self.output_dir = output_dir
+        self.summaries = []
+        self.current = None
+        self.active_stage = None
+        if self.profile:
+            os.makedirs(self.output_dir, exist_ok=True)
+            tracemalloc.start()
+
+    def begin_pdf(self, pdf_file_path: str):
+        """PDF 하나의 집계 시작"""
+        self.current = {
+            "file_name": os.path.basename(pdf_file_path),
+            "bytes": os.path.getsize(pdf_file_path),
+            "started": time.perf_counter(),
+            "seconds": defaultdict(float),
+            "peak_memory": defaultdict(int),
+            "pdf_peak_memory": 0,
+            "memory_at_start": 0,
+            "counters": defaultdict(int),
+            "profilers": {},
+        }
+        if self.profile:
+            tracemalloc.reset_peak()
+            self.current["memory_at_start"] = tracemalloc.get_traced_memory()[0]
+
+    def _record_pdf_peak(self):
+        """단계마다 reset_peak을 호출하므로, 리셋 전에 PDF 처리 구간 최대치에 반영"""
+        peak = tracemalloc.get_traced_memory()[1]
+        self.current["pdf_peak_memory"] = max(self.current["pdf_peak_memory"], peak)
+
+    def count(self, name: str, amount: int = 1):
+        """카운터 증가 (pages, chunks, embedded, duplicates, upserted, failed 등)"""
+        if self.current is not None:
+            self.current["counters"][name] += amount
+
+    @contextmanager
+    def stage(self, name: str):
+        """단계 하나의 실행 구간 측정. 중첩된 단계는 바깥 단계에 포함되어 집계됨"""
+        if self.current is None or self.active_stage is not None:
+            yield
+            return
+        self.active_stage = name
+        profiler = None
+        if self.profile:
+            profiler = self.current["profilers"].setdefault(name, cProfile.Profile())
+            self._record_pdf_peak()
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+            profiler.enable()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.current["seconds"][name] += time.perf_counter() - started
+            if profiler is not None:
+                profiler.disable()
+                # 이전 단계/이전 PDF에서 잡고 있는 메모리를 제외한 이 단계의 최대 증가분
+                peak = tracemalloc.get_traced_memory()[1] - baseline
+                self.current["peak_memory"][name] = max(self.current["peak_memory"][name], peak)
+                self._record_pdf_peak()
+            self.active_stage = None
+
+    def end_pdf(self) -> dict:
+        """PDF 하나의 집계 종료. 요약을 반환하고 profile 모드이면 파일로 저장"""
+        if self.profile:
+            self._record_pdf_peak()
+        record = self.current
+        self.current = None
+        elapsed = time.perf_counter() - record["started"]
+        counters = dict(record["counters"])
+        seconds = {stage: round(record["seconds"].get(stage, 0.0), 3) for stage in STAGES}
+        extract_seconds = record["seconds"].get("extract", 0.0)
+        chunk_seconds = record["seconds"].get("chunk", 0.0)
+        summary = {
+            "file_name": record["file_name"],
+            "bytes": record["bytes"],
+            "profiled": self.profile,  # True이면 시간/처리량에 프로파일링 오버헤드 포함
+            "elapsed_seconds": round(elapsed, 3),
+            "stage_seconds": seconds,
+            "counters": counters,
+            "pages_per_sec": round(counters.get("pages", 0) / extract_seconds, 2) if extract_seconds else None,
+            "chunks_per_sec": round(counters.get("chunks", 0) / chunk_seconds, 2) if chunk_seconds else None,
+        }
+        if self.profile:
+            # PDF 처리 구간(begin_pdf~end_pdf)의 tracemalloc 최대치. 이전 PDF에서 남은 메모리도 포함되므로 시작 시점 값도 함께 기록
+            summary["peak_memory_bytes"] = record["pdf_peak_memory"]
+            summary["memory_at_start_bytes"] = record["memory_at_start"]
+            summary["stage_peak_memory_delta_bytes"] = {stage: record["peak_memory"].get(stage, 0) for stage in STAGES}
+            stem = os.path.splitext(record["file_name"])[0]
+            summary["profiles"] = {}
+            for stage, profiler in record["profilers"].items():
+                path = os.path.join(self.output_dir, f"{stem}_{stage}.prof")
+                profiler.dump_stats(path)
+                summary["profiles"][stage] = path
+        self.summaries.append(summary)
+        if self.profile:
+            self.write_summary()
+        return summary
+
+    def close(self):
+        """profile 모드에서 시작한 tracemalloc 중지"""
+        if self.profile and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    def write_summary(self):
+        """지금까지 처리한 PDF 요약을 summary.json으로 저장"""
+        path = os.path.join(self.output_dir, "summary.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.summaries, f, ensure_ascii=False, indent=2)
+        return path
+
+
+def print_summary(summary: dict):
+    """PDF 하나의 단계별 요약 출력"""
+    print(f"\n=== 처리 요약: {summary['file_name']} ===")
+    print(f"파일 크기: {summary['bytes'] / (1024*1024):.2f} MB, 총 소요 시간: {summary['elapsed_seconds']}초")
+    if summary["profiled"]:
+        print("(프로파일 모드: 시간/처리량에 cProfile/tracemalloc 오버헤드 포함)")
+        print(f"최대 메모리: {summary['peak_memory_bytes'] / (1024*1024):.1f} MB"
+              f" (시작 시점 {summary['memory_at_start_bytes'] / (1024*1024):.1f} MB)")
+    for stage, seconds in summary["stage_seconds"].items():
+        line = f"- {stage}: {seconds}초"
+        if summary["profiled"]:
+            line += f", 최대 메모리 증가 {summary['stage_peak_memory_delta_bytes'][stage] / (1024*1024):.1f} MB"
+        print(line)
+    print(f"pages/sec: {summary['pages_per_sec']}, chunks/sec: {summary['chunks_per_sec']}")
+    print("카운터: " + ", ".join(f"{name}={value}" for name, value in summary["counters"].items()))
@@ -0,0 +1,114 @@
+import hashlib
+import re
+from collections import Counter
+
+# 구조 인식 추출 설정
+LAYOUT_VERSION = 3  # extract_page_layout 또는 표 추출 방식 변경 시 올려서 기존 캐시 무효화
+HEADER_FOOTER_SCAN_LINES = 2  # 페이지 상/하단에서 머리글/바닥글 후보로 볼 줄 수
+HEADER_FOOTER_MIN_RATIO = 0.3  # 전체 페이지 중 이 비율 이상 반복되면 머리글/바닥글로 판단
+HEADER_FOOTER_MIN_PAGES = 3
+
+
+def clip_bbox(bbox: tuple, page_bbox: tuple):
+    """표 영역을 페이지 영역 안으로 자름. 면적이 없으면 None"""
+    x0, top, x1, bottom = (
+        max(bbox[0], page_bbox[0]),
+        max(bbox[1], page_bbox[1]),
+        min(bbox[2], page_bbox[2]),
+        min(bbox[3], page_bbox[3]),
+    )
+    if x1 <= x0 or bottom <= top:
+        return None
+    return (x0, top, x1, bottom)
+
+
+def extract_page_layout(page) -> dict:
+    """
+    페이지 하나의 레이아웃 추출 (page: pdfplumber Page).
+    표는 영역을 찾아 행 단위로 한 번만 추출하고, 본문은 표 영역을 제외하고 추출.
+    반환 형식: {"lines": 본문 줄 목록, "tables": [[행, ...], ...]}
+    """
+    tables = []
+    body = page
+    for table in page.find_tables():
+        # 괘선이 CropBox 밖으로 나가는 표가 있어 페이지 안으로 잘라서 사용
+        bbox = clip_bbox(table.bbox, page.bbox)
+        if bbox is None:
+            continue
+        rows = []
+        for row in table.extract():
+            cells = [" ".join((cell or "").split()) for cell in row]
+            if any(cells):
+                rows.append(" | ".join(cells))
+        if rows:
+            tables.append(rows)
+        body = body.outside_bbox(bbox, strict=False)
+    body_text = body.extract_text() or ""
+    return {
+        "lines": [line for line in body_text.splitlines() if line.strip()],
+        "tables": tables,
+    }
+
+
+def normalize_line(line: str) -> str:
+    """머리글/바닥글 비교용 정규화 (페이지 번호 등 숫자는 무시)"""
+    return re.sub(r"\d+", "#", " ".join(line.split()))
+
+
+def find_running_lines(layouts: list) -> set:
+    """여러 페이지의 상/하단에 반복되는 머리글/바닥글 줄 찾기"""
+    counts = Counter()
+    for layout in layouts:
+        lines = layout["lines"]
+        if len(lines) <= HEADER_FOOTER_SCAN_LINES * 2:
+            continue  # 본문이 짧은 페이지는 판단에서 제외
+        edge = lines[:HEADER_FOOTER_SCAN_LINES] + lines[-HEADER_FOOTER_SCAN_LINES:]
+        counts.update({normalize_line(line) for line in edge})
+    threshold = max(HEADER_FOOTER_MIN_PAGES, len(layouts) * HEADER_FOOTER_MIN_RATIO)
+    return {line for line, count in counts.items() if count >= threshold}
+
+
+def strip_running_lines(lines: list, running: set) -> list:
+    """페이지 상/하단의 머리글/바닥글 줄 제거"""
+    start, end = 0, len(lines)
+    while start < end and start < HEADER_FOOTER_SCAN_LINES and normalize_line(lines[start]) in running:
+        start += 1
+    while end > start and len(lines) - end < HEADER_FOOTER_SCAN_LINES and normalize_line(lines[end - 1]) in running:
+        end -= 1
+    return lines[start:end]
+
+
+def build_structured_texts(layouts: list) -> tuple:
+    """
+    페이지별 레이아웃에서 머리글/바닥글을 제거하고, 표는 문서 전체에서 한 번만 포함.
+    반환: ([(page_number, page_text), ...], report)
+    """
+    running = find_running_lines(layouts)
+    texts = []
+    seen_tables = set()
+    report = {
+        "pages": len(layouts),
+        "header_footer_patterns": len(running),
+        "header_footer_lines": 0,
+        "tables": 0,
+        "duplicate_tables": 0,
+    }
+    for i, layout in enumerate(layouts):
+        page_num = i + 1
+        lines = strip_running_lines(layout["lines"], running)
+        report["header_footer_lines"] += len(layout["lines"]) - len(lines)
+        blocks = ["\n".join(lines)] if lines else []
+        for rows in layout["tables"]:
+            table_text = "\n".join(rows)
+            table_hash = hashlib.md5(table_text.encode()).hexdigest()
+            if table_hash in seen_tables:
+                report["duplicate_tables"] += 1
+                continue
+            seen_tables.add(table_hash)
+            report["tables"] += 1
+            blocks.append(table_text)
+
+        page_text = "\n\n".join(blocks)
+        if page_text.strip():
+            texts.append((page_num, page_text))
+    return texts, report
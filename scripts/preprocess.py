@@ -5,8 +5,13 @@ from pinecone import Pinecone
 from openai import OpenAI
 from dotenv import load_dotenv
 from langchain.text_splitter import RecursiveCharacterTextSplitter
+import argparse
 import hashlib
+import json
 import sys
+import tempfile
+from ingest_profile import StageProfiler, progress, print_summary
+from pdf_layout import LAYOUT_VERSION, build_structured_texts, extract_page_layout
 
 # 즉시 출력을 위한 설정
 sys.stdout.flush()
@@ -33,6 +38,18 @@ print("Pinecone 초기화 중...")
 pc = Pinecone(api_key=PINECONE_API_KEY)
 index = pc.Index("actuary-docs")  # 이미 생성된 인덱스 사용
 
+# 구조 인식 추출 설정
+LAYOUT_CACHE_DIR = "data/layout_cache"  # 페이지별 레이아웃 캐시 저장 위치 (레이아웃 규칙은 pdf_layout.py)
+
+# 로그/프로파일 설정 (실행 인자 --quiet, --profile로 변경)
+QUIET = False  # True이면 페이지/청크 단위 로그 대신 진행률 표시줄과 단계별 카운터만 출력
+profiler = StageProfiler()
+
+def log(message: str):
+    """페이지/청크 단위 상세 로그 (QUIET 모드에서는 출력하지 않음)"""
+    if not QUIET:
+        print(message)
+
 def get_pdf_texts(pdf_file_path: str) -> list:
     """
     PDF를 페이지 단위로 읽어서 [(page_number, page_text), ...] 형태로 반환.
@@ -42,17 +59,119 @@ def get_pdf_texts(pdf_file_path: str) -> list:
     try:
         with pdfplumber.open(pdf_file_path) as pdf:
             print(f"총 {len(pdf.pages)}페이지 발견")
-            for i, page in enumerate(pdf.pages):
-                print(f"페이지 {i+1} 처리 중...")
+            for i, page in enumerate(progress(pdf.pages, len(pdf.pages), "텍스트 추출", QUIET)):
+                log(f"페이지 {i+1} 처리 중...")
+                profiler.count("pages")
                 page_text = page.extract_text()
                 if page_text and page_text.strip():
                     texts.append((i+1, page_text))
-                    print(f"페이지 {i+1} 텍스트 추출 완료 (길이: {len(page_text)})")
+                    log(f"페이지 {i+1} 텍스트 추출 완료 (길이: {len(page_text)})")
     except Exception as e:
         print(f"PDF 읽기 오류: {str(e)}")
         raise
     return texts
 
+def get_file_hash(file_path: str) -> str:
+    """파일 내용의 해시값 생성 (레이아웃 캐시 키로 사용)"""
+    md5 = hashlib.md5()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            md5.update(block)
+    return md5.hexdigest()
+
+def get_layout_cache_path(pdf_file_path: str) -> str:
+    """레이아웃 캐시 파일 경로 (PDF 내용 해시 + 레이아웃 버전)"""
+    return os.path.join(LAYOUT_CACHE_DIR, f"{get_file_hash(pdf_file_path)}_v{LAYOUT_VERSION}.json")
+
+def write_json_atomic(path: str, data):
+    """임시 파일에 쓴 뒤 교체하여, 중간에 중단되어도 깨진 JSON이 남지 않도록 저장"""
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+def read_layout_cache(cache_path: str):
+    """레이아웃 캐시 읽기. 없으면 None"""
+    if not os.path.exists(cache_path):
+        return None
+    with open(cache_path, encoding="utf-8") as f:
+        return json.load(f)
+
+def load_pdf_layout(pdf_file_path: str) -> list:
+    """
+    PDF의 페이지별 레이아웃을 반환. 캐시가 있으면 PDF를 다시 파싱하지 않음.
+    """
+    cache_path = get_layout_cache_path(pdf_file_path)
+    cache = read_layout_cache(cache_path)
+    if cache:
+        print(f"레이아웃 캐시 사용: {cache_path}")
+        return cache["pages"]
+
+    print(f"PDF 레이아웃 분석 시작: {pdf_file_path}")
+    layouts = []
+    with pdfplumber.open(pdf_file_path) as pdf:
+        print(f"총 {len(pdf.pages)}페이지 발견")
+        for i, page in enumerate(progress(pdf.pages, len(pdf.pages), "레이아웃 분석", QUIET)):
+            log(f"페이지 {i+1} 레이아웃 분석 중...")
+            layouts.append(extract_page_layout(page))
+            page.flush_cache()  # 페이지 객체 캐시 해제 (메모리 절약)
+
+    write_json_atomic(cache_path, {"pages": layouts})
+    print(f"레이아웃 캐시 저장 완료: {cache_path}")
+    return layouts
+
+def get_cached_baseline_chunk_count(pdf_file_path: str):
+    """캐시된 기존 방식 청크 수. 아직 --compare로 계산하지 않았으면 None"""
+    cache = read_layout_cache(get_layout_cache_path(pdf_file_path))
+    return cache.get("baseline_chunks") if cache else None
+
+def get_baseline_chunk_count(pdf_file_path: str) -> int:
+    """
+    기존 방식(page.extract_text()) 기준 청크 수. 비교 리포트용이며 결과 숫자만 캐시에 저장.
+    """
+    cache_path = get_layout_cache_path(pdf_file_path)
+    cache = read_layout_cache(cache_path)
+    if cache and "baseline_chunks" in cache:
+        return cache["baseline_chunks"]
+
+    raw_texts = []
+    with pdfplumber.open(pdf_file_path) as pdf:
+        for i, page in enumerate(progress(pdf.pages, len(pdf.pages), "기존 방식 비교", QUIET)):
+            page_text = page.extract_text()
+            if page_text and page_text.strip():
+                raw_texts.append((i+1, page_text))
+            page.flush_cache()
+    baseline_chunks = count_unique_chunks(raw_texts)
+
+    if cache:
+        cache["baseline_chunks"] = baseline_chunks
+        write_json_atomic(cache_path, cache)
+    return baseline_chunks
+
+def get_structured_pdf_texts(pdf_file_path: str) -> tuple:
+    """
+    구조 인식 추출 모드.
+    반복되는 머리글/바닥글을 제거하고, 표는 압축된 행 형태로 한 번만 포함.
+    반환: ([(page_number, page_text), ...], report)
+    """
+    print(f"PDF 파일 읽기 시작 (구조 인식 모드): {pdf_file_path}")
+    try:
+        layouts = load_pdf_layout(pdf_file_path)
+    except Exception as e:
+        print(f"PDF 읽기 오류: {str(e)}")
+        raise
+
+    profiler.count("pages", len(layouts))
+    texts, report = build_structured_texts(layouts)
+    print(f"머리글/바닥글 패턴 {report['header_footer_patterns']}개 발견")
+    return texts, report
+
 def chunk_texts(texts: list, chunk_size=500, chunk_overlap=50) -> list:
     """
     LangChain의 RecursiveCharacterTextSplitter를 이용해 chunk list 반환.
@@ -67,14 +186,15 @@ def chunk_texts(texts: list, chunk_size=500, chunk_overlap=50) -> list:
     
     chunked = []
     for page_num, page_text in texts:
-        print(f"페이지 {page_num} 텍스트 분할 중...")
+        log(f"페이지 {page_num} 텍스트 분할 중...")
         chunks = splitter.split_text(page_text)
-        print(f"페이지 {page_num}: {len(chunks)}개의 청크 생성됨")
+        log(f"페이지 {page_num}: {len(chunks)}개의 청크 생성됨")
         for chunk in chunks:
             chunked.append({
                 "page": page_num,
                 "text": chunk
             })
+    profiler.count("chunks", len(chunked))
     print(f"총 {len(chunked)}개의 청크 생성 완료")
     return chunked
 
@@ -82,45 +202,90 @@ def get_text_hash(text: str) -> str:
     """텍스트의 해시값 생성"""
     return hashlib.md5(text.encode()).hexdigest()
 
-def embed_and_upsert(chunks: list, file_name: str):
+def count_unique_chunks(texts: list, chunk_size=500, chunk_overlap=50) -> int:
+    """
+    임베딩 대상이 되는 (중복 제거 후) 청크 수 계산. 로그 없이 분할만 수행.
+    """
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap
+    )
+    hashes = set()
+    for _, page_text in texts:
+        hashes.update(get_text_hash(chunk) for chunk in splitter.split_text(page_text))
+    return len(hashes)
+
+def upsert_vectors(vectors: list, label: str = "배치") -> tuple:
+    """
+    벡터 업서트. 실패하면 10개씩 나눠서 재시도.
+    반환: (업서트된 벡터 ID 목록, 실패한 벡터 수)
+    """
+    log(f"\n{label} 업서트 실행 중... ({len(vectors)}개 벡터)")
+    with profiler.stage("upsert"):
+        try:
+            index.upsert(vectors=vectors)
+            log(f"{label} 업서트 완료")
+            return [vector[0] for vector in vectors], 0
+        except Exception as e:
+            print(f"{label} 업서트 중 오류 발생: {str(e)}")
+
+        # 실패한 경우 배치 크기를 줄여서 재시도
+        print("배치 크기를 줄여서 재시도합니다...")
+        upserted_ids = []
+        failed = 0
+        for small_batch in [vectors[i:i+10] for i in range(0, len(vectors), 10)]:
+            try:
+                index.upsert(vectors=small_batch)
+                upserted_ids.extend(vector[0] for vector in small_batch)
+                log(f"작은 배치 업서트 성공 ({len(small_batch)}개)")
+            except Exception as e2:
+                failed += len(small_batch)
+                print(f"작은 배치 업서트 실패: {str(e2)}")
+        return upserted_ids, failed
+
+def embed_and_upsert(chunks: list, file_name: str, text_hashes: list) -> tuple:
     """
     chunked 텍스트를 OpenAI 임베딩으로 변환 → Pinecone에 upsert
     chunks: [{"page": ~, "text": ~ }, ... ]
+    text_hashes: chunks와 같은 순서의 텍스트 해시 목록
+    반환: (업서트된 벡터 ID 집합, 임베딩/업서트에 실패한 청크 수)
     """
     print(f"임베딩 및 업서트 시작 (총 {len(chunks)}개 청크)")
     # 파일명에서 한글 제거하고 영문/숫자만 유지
     ascii_file_name = ''.join(c for c in file_name if ord(c) < 128)
-    print(f"ASCII 파일명: {ascii_file_name}")
+    log(f"ASCII 파일명: {ascii_file_name}")
     
     # 이미 처리된 텍스트 해시 추적
     processed_hashes = set()
     vectors_to_upsert = []
+    upserted_ids = set()
+    failed = 0
     batch_size = 50  # 한 번에 처리할 벡터 수
     
-    for i, ch in enumerate(chunks, 1):
+    for i, (ch, text_hash) in enumerate(progress(zip(chunks, text_hashes), len(chunks), "임베딩", QUIET), 1):
         try:
             text = ch["text"]
             page_num = ch["page"]
             
-            # 텍스트 해시 생성
-            text_hash = get_text_hash(text)
-            
             # 이미 처리된 텍스트는 건너뛰기
             if text_hash in processed_hashes:
-                print(f"중복된 텍스트 발견 - 건너뛰기 (페이지 {page_num})")
+                log(f"중복된 텍스트 발견 - 건너뛰기 (페이지 {page_num})")
+                profiler.count("duplicates")
                 continue
             
             processed_hashes.add(text_hash)
-            print(f"청크 {i}/{len(chunks)} 처리 중 (페이지 {page_num})")
+            log(f"청크 {i}/{len(chunks)} 처리 중 (페이지 {page_num})")
             
             # OpenAI Embedding API 호출
-            print(f"OpenAI API 호출 중... (청크 {i})")
-            response = client.embeddings.create(
-                model="text-embedding-ada-002",
-                input=text
-            )
+            log(f"OpenAI API 호출 중... (청크 {i})")
+            with profiler.stage("embed"):
+                response = client.embeddings.create(
+                    model="text-embedding-ada-002",
+                    input=text
+                )
             embedding = response.data[0].embedding
-            print(f"임베딩 생성 완료 (청크 {i})")
+            profiler.count("embedded")
+            log(f"임베딩 생성 완료 (청크 {i})")
             
             # 벡터 준비
             vector_id = f"{ascii_file_name}_p{page_num}_{text_hash[:16]}"
@@ -134,72 +299,145 @@ def embed_and_upsert(chunks: list, file_name: str):
             
             # 배치 크기에 도달하면 업서트 실행
             if len(vectors_to_upsert) >= batch_size:
-                print(f"\n배치 업서트 실행 중... ({len(vectors_to_upsert)}개 벡터)")
-                try:
-                    index.upsert(vectors=vectors_to_upsert)
-                    print("배치 업서트 완료")
-                    vectors_to_upsert = []  # 벡터 리스트 초기화
-                except Exception as e:
-                    print(f"배치 업서트 중 오류 발생: {str(e)}")
-                    # 실패한 경우 배치 크기를 줄여서 재시도
-                    if len(vectors_to_upsert) > 10:
-                        print("배치 크기를 줄여서 재시도합니다...")
-                        for small_batch in [vectors_to_upsert[i:i+10] for i in range(0, len(vectors_to_upsert), 10)]:
-                            try:
-                                index.upsert(vectors=small_batch)
-                                print(f"작은 배치 업서트 성공 ({len(small_batch)}개)")
-                            except Exception as e2:
-                                print(f"작은 배치 업서트 실패: {str(e2)}")
-                    vectors_to_upsert = []
+                batch_ids, batch_failed = upsert_vectors(vectors_to_upsert)
+                upserted_ids.update(batch_ids)
+                failed += batch_failed
+                vectors_to_upsert = []  # 벡터 리스트 초기화
             
         except Exception as e:
             print(f"청크 {i} 처리 중 오류 발생: {str(e)}")
+            failed += 1
             continue
     
     # 남은 벡터들 처리
     if vectors_to_upsert:
-        print(f"\n마지막 배치 업서트 실행 중... ({len(vectors_to_upsert)}개 벡터)")
-        try:
-            index.upsert(vectors=vectors_to_upsert)
-            print("마지막 배치 업서트 완료")
-        except Exception as e:
-            print(f"마지막 배치 업서트 중 오류 발생: {str(e)}")
-            # 실패한 경우 배치 크기를 줄여서 재시도
-            print("배치 크기를 줄여서 재시도합니다...")
-            for small_batch in [vectors_to_upsert[i:i+10] for i in range(0, len(vectors_to_upsert), 10)]:
-                try:
-                    index.upsert(vectors=small_batch)
-                    print(f"작은 배치 업서트 성공 ({len(small_batch)}개)")
-                except Exception as e2:
-                    print(f"작은 배치 업서트 실패: {str(e2)}")
+        batch_ids, batch_failed = upsert_vectors(vectors_to_upsert, "마지막 배치")
+        upserted_ids.update(batch_ids)
+        failed += batch_failed
     
-    print("모든 벡터 업서트 완료")
+    profiler.count("upserted", len(upserted_ids))
+    profiler.count("failed", failed)
+    if failed:
+        print(f"벡터 업서트 완료 (실패 {failed}개)")
+    else:
+        print("모든 벡터 업서트 완료")
+    return upserted_ids, failed
+
+def print_ingest_report(report: dict):
+    """구조 인식 추출 결과 리포트 출력"""
+    print("\n=== 추출 리포트 ===")
+    print(f"페이지 수: {report['pages']}")
+    print(f"제거된 머리글/바닥글 줄 수: {report['header_footer_lines']}")
+    print(f"추출된 표 수: {report['tables']} (중복 표 {report['duplicate_tables']}개 제외)")
+    if "structured_chunks" in report:
+        print(f"구조 인식 방식 청크 수: {report['structured_chunks']}")
+    if report.get("baseline_chunks") is not None:
+        print(f"기존 방식 청크 수: {report['baseline_chunks']}")
+        print(f"제거된 청크 수: {report['eliminated_chunks']}")
+    else:
+        print("제거된 청크 수: 기존 방식 청크 수가 아직 계산되지 않음 (--compare로 한 번 실행하면 캐시되어 이후 기본 표시)")
+
+def delete_stale_vectors(file_name: str, keep_ids: set) -> int:
+    """
+    이번 처리에서 업서트하지 않은 같은 파일의 이전 벡터 삭제.
+    추출 방식이 바뀌면 벡터 ID(페이지+텍스트 해시)도 바뀌므로, 지우지 않으면 이전 머리글/바닥글 벡터가 인덱스에 남음.
+    ID 조회는 check_vectors.py와 같이 더미 벡터 + 메타데이터 필터 검색 사용 (한 번에 최대 10000개).
+    """
+    removed = 0
+    try:
+        while True:
+            results = index.query(
+                vector=[0] * 1536,  # 더미 벡터
+                top_k=10000,
+                filter={"file_name": {"$eq": file_name}},
+                include_metadata=False
+            )
+            stale_ids = [match.id for match in results.matches if match.id not in keep_ids]
+            if not stale_ids:
+                break
+            for start in range(0, len(stale_ids), 1000):
+                index.delete(ids=stale_ids[start:start+1000])
+            removed += len(stale_ids)
+    except Exception as e:
+        # 새 벡터는 이미 저장되었으므로 처리 자체는 실패로 보지 않음
+        print(f"이전 벡터 삭제 중 오류 발생 ({removed}개 삭제됨): {str(e)}")
+        return removed
+    print(f"이전 벡터 {removed}개 삭제 완료: {file_name}")
+    return removed
 
-def ingest_pdf(pdf_file_path: str):
+def ingest_pdf(pdf_file_path: str, structured: bool = True, compare: bool = False, replace: bool = True):
     """
     PDF 하나를 파이프라인에 태워서 pinecone에 저장
+    structured=True이면 구조 인식 추출 모드 사용 (머리글/바닥글 제거, 표 행 단위 추출)
+    compare=True이면 기존 방식 청크 수를 계산해 캐시 (기존 방식 추출을 한 번 더 수행).
+    한 번 계산해 두면 이후 실행에서는 캐시된 값으로 제거된 청크 수를 리포트에 표시.
+    replace=True이면 업서트가 실패 없이 끝난 뒤에만 같은 파일의 이전 벡터(이번에 업서트하지 않은 ID)를 삭제
     """
     print(f"\n=== PDF 처리 시작: {pdf_file_path} ===")
     file_name = os.path.basename(pdf_file_path)
+    profiler.begin_pdf(pdf_file_path)
     try:
         # 1) PDF -> 텍스트 추출
         print("1. PDF 텍스트 추출 단계")
-        texts = get_pdf_texts(pdf_file_path)
+        with profiler.stage("extract"):
+            if structured:
+                texts, report = get_structured_pdf_texts(pdf_file_path)
+            else:
+                texts = get_pdf_texts(pdf_file_path)
         
         # 2) 텍스트 분할
         print("\n2. 텍스트 분할 단계")
-        chunks = chunk_texts(texts, chunk_size=500, chunk_overlap=50)
+        with profiler.stage("chunk"):
+            chunks = chunk_texts(texts, chunk_size=500, chunk_overlap=50)
+        
+        # 텍스트 해시 생성 (청크마다 측정하면 측정 비용이 더 크므로 한 번에 집계, 리포트와 업서트에서 공유)
+        with profiler.stage("hash"):
+            text_hashes = [get_text_hash(ch["text"]) for ch in chunks]
+        
+        if structured:
+            report["structured_chunks"] = len(set(text_hashes))
+            if compare:
+                with profiler.stage("compare"):
+                    report["baseline_chunks"] = get_baseline_chunk_count(pdf_file_path)
+            else:
+                report["baseline_chunks"] = get_cached_baseline_chunk_count(pdf_file_path)
+            if report["baseline_chunks"] is not None:
+                report["eliminated_chunks"] = report["baseline_chunks"] - report["structured_chunks"]
+            print_ingest_report(report)
         
         # 3) 임베딩 후 Pinecone 저장
         print("\n3. 임베딩 및 저장 단계")
-        embed_and_upsert(chunks, file_name)
+        upserted_ids, failed = embed_and_upsert(chunks, file_name, text_hashes)
+        if replace:
+            if failed:
+                # 일부만 저장된 상태에서 이전 벡터까지 지우면 문서가 비므로 유지
+                print(f"실패한 청크가 {failed}개 있어 이전 벡터 삭제를 건너뜁니다. 다시 실행하세요.")
+            else:
+                delete_stale_vectors(file_name, upserted_ids)
         
         print(f"\n=== {pdf_file_path} 처리 완료 ===")
     except Exception as e:
         print(f"\n!!! {pdf_file_path} 처리 중 오류 발생: {str(e)} !!!")
         raise
+    finally:
+        print_summary(profiler.end_pdf())
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="PDF를 임베딩하여 Pinecone에 저장")
+    parser.add_argument("--quiet", action="store_true",
+                        help="페이지/청크 단위 로그 대신 진행률 표시줄과 단계별 카운터만 출력")
+    parser.add_argument("--profile", action="store_true",
+                        help="단계별 cProfile/tracemalloc 데이터를 수집하여 --profile-dir에 저장")
+    parser.add_argument("--profile-dir", default="profiles",
+                        help="프로파일 결과 저장 위치 (기본값: profiles)")
+    parser.add_argument("--compare", action="store_true",
+                        help="기존 추출 방식 청크 수를 계산해 캐시하고 제거된 청크 수를 리포트에 표시 (PDF당 한 번 추가 추출)")
+    parser.add_argument("--legacy", action="store_true",
+                        help="구조 인식 추출 대신 기존 page.extract_text() 추출 사용")
+    args = parser.parse_args()
+    QUIET = args.quiet
+    profiler = StageProfiler(profile=args.profile, output_dir=args.profile_dir)
+
     print("\n=== PDF 처리 시작 ===")
     # 필요에 따라 여러 pdf ingest
     pdf_dir = "data/pdfs"
@@ -229,7 +467,7 @@ if __name__ == "__main__":
                 continue
                 
             print(f"파일 크기: {os.path.getsize(pdf_path) / (1024*1024):.2f} MB")
-            ingest_pdf(os.path.join(pdf_dir, pdf_file))
+            ingest_pdf(os.path.join(pdf_dir, pdf_file), structured=not args.legacy, compare=args.compare)
             print(f"=== {pdf_file} 처리 완료 ===")
         except Exception as e:
             print(f"!!! {pdf_file} 처리 중 오류 발생: {str(e)} !!!")
@@ -237,4 +475,7 @@ if __name__ == "__main__":
             import traceback
             print(traceback.format_exc())
     
+    profiler.close()
+    if args.profile:
+        print(f"\n프로파일 요약 저장 완료: {os.path.join(args.profile_dir, 'summary.json')}")
     print("\n모든 PDF 처리가 완료되었습니다!") 
\ No newline at end of file
@@ -1,8 +1,10 @@
 import streamlit as st
 import os
+import uuid
 from openai import OpenAI
 from dotenv import load_dotenv
 from pinecone import Pinecone
+from chat_history import HistoryStore
 
 # 환경 변수 로드
 load_dotenv()
@@ -122,6 +124,15 @@ def get_relevant_context(query, top_k=5):
     
     return "\n\n".join(contexts[:5])
 
+@st.cache_resource
+def get_history_store():
+    """서버 전체에서 공유하는 대화 기록 저장소"""
+    return HistoryStore()
+
+def get_conversation():
+    """현재 세션의 대화 기록"""
+    return get_history_store().get(st.session_state.session_id)
+
 def get_ai_response(query, temperature=0.7):
     """OpenAI API를 사용하여 응답 생성"""
     # 관련 문서 검색
@@ -130,9 +141,11 @@ def get_ai_response(query, temperature=0.7):
     # 시스템 메시지를 첫 번째로 추가
     messages = [{"role": "system", "content": SYSTEM_PROMPT.format(context=context)}]
     
-    # 최근 10개의 대화 기록을 추가
-    recent_messages = st.session_state.messages[-10:] if len(st.session_state.messages) > 10 else st.session_state.messages
-    messages.extend(recent_messages)
+    # 오래된 대화는 요약으로, 최근 10개의 대화 기록은 원문으로 추가
+    conversation = get_conversation()
+    if conversation.summary:
+        messages.append({"role": "system", "content": f"이전 대화 요약:\n{conversation.summary}"})
+    messages.extend(conversation.messages())
     
     # 현재 질문 추가
     messages.append({"role": "user", "content": query})
@@ -148,10 +161,13 @@ def get_ai_response(query, temperature=0.7):
 
 def initialize_session_state():
     """세션 상태 초기화"""
-    if 'messages' not in st.session_state:
-        st.session_state.messages = [
-            {"role": "assistant", "content": "안녕하세요, K-Actuary AI Assistant입니다. '지급여력금액에 대해서 설명해줘'와 같은 보험계리 관련 질문을 해주세요. 정보 정확성 검토를 위해 좌측 참고된 pdf 문서의 페이지번호를 참고하여 답변을 드립니다."}
-        ]
+    if 'session_id' not in st.session_state:
+        st.session_state.session_id = uuid.uuid4().hex
+        get_history_store().append(
+            st.session_state.session_id,
+            "assistant",
+            "안녕하세요, K-Actuary AI Assistant입니다. '지급여력금액에 대해서 설명해줘'와 같은 보험계리 관련 질문을 해주세요. 정보 정확성 검토를 위해 좌측 참고된 pdf 문서의 페이지번호를 참고하여 답변을 드립니다."
+        )
     if 'temperature' not in st.session_state:
         st.session_state.temperature = 0.7
 
@@ -219,20 +235,31 @@ def main():
         - 금융위_241106_IFRS17 주요 계리가정 가이드라인.pdf
         """)
         
+        st.markdown("---")
+        history_store = get_history_store()
+        st.caption(
+            f"대화 기록 메모리: 현재 세션 {get_conversation().memory_usage() / 1024:.1f} KB"
+            f" / 활성 세션 {len(history_store.sessions)}개, 총 {history_store.total_memory / 1024:.1f} KB (최근 집계 기준)"
+        )
+        
     
     # 메인 영역
     st.title("K Actuary AI Agent")
     st.markdown("---")
     
     # 채팅 메시지 표시
-    for message in st.session_state.messages:
+    conversation = get_conversation()
+    if conversation.summary:
+        with st.expander("이전 대화 요약"):
+            st.text(conversation.summary)
+    for message in conversation.messages():
         with st.chat_message(message["role"]):
             st.write(message["content"])
     
     # 사용자 입력
     if prompt := st.chat_input("질문을 입력하세요..."):
         # 사용자 메시지 추가
-        st.session_state.messages.append({"role": "user", "content": prompt})
+        get_history_store().append(st.session_state.session_id, "user", prompt)
         with st.chat_message("user"):
             st.write(prompt)
         
@@ -241,7 +268,7 @@ def main():
             with st.spinner("답변을 생성하고 있습니다..."):
                 response = get_ai_response(prompt, st.session_state.temperature)
                 st.write(response)
-                st.session_state.messages.append({"role": "assistant", "content": response})
+                get_history_store().append(st.session_state.session_id, "assistant", response)
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
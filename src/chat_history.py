@@ -0,0 +1,233 @@
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from collections import deque
+
+# 대화 기록 저장소 설정
+RECENT_WINDOW = 10  # 원문을 유지하는 최근 대화 수 (get_ai_response 전송 범위와 동일)
+SUMMARY_LINE_CHARS = 120  # 요약에 남기는 대화 한 건당 최대 글자 수
+SUMMARY_MAX_CHARS = 2000  # 누적 요약 최대 글자 수 (초과 시 오래된 요약부터 제거)
+IDLE_SECONDS = 30 * 60  # 이 시간 이상 사용하지 않은 세션은 디스크로 내림
+SPILL_TTL_SECONDS = 24 * 60 * 60  # 디스크로 내린 뒤 이 시간이 지나도록 다시 찾지 않은 세션은 삭제
+SWEEP_INTERVAL_SECONDS = 60  # 유휴 세션 검사 및 만료된 디스크 세션 정리 주기
+SPILL_DIR = "data/chat_sessions"
+
+# 역할 문자열을 세션마다 중복 저장하지 않도록 정수 코드로 저장
+ROLE_CODES = {"system": 0, "user": 1, "assistant": 2}
+ROLE_NAMES = {code: role for role, code in ROLE_CODES.items()}
+
+
+class Conversation:
+    """
+    세션 하나의 대화 기록.
+    최근 RECENT_WINDOW개의 대화는 (역할 코드, 원문)으로 유지하고,
+    그보다 오래된 대화는 한 줄 요약으로만 누적 요약에 남김.
+    """
+    __slots__ = ("recent", "summary", "turn_count", "last_access")
+
+    def __init__(self, window=RECENT_WINDOW):
+        self.recent = deque(maxlen=window)
+        self.summary = ""
+        self.turn_count = 0
+        self.last_access = time.time()
+
+    def append(self, role: str, content: str):
+        """대화 추가. 창을 벗어나는 대화는 요약으로 이동"""
+        if len(self.recent) == self.recent.maxlen:
+            self._summarize(*self.recent[0])
+        self.recent.append((ROLE_CODES[role], content))
+        self.turn_count += 1
+
+    def _summarize(self, role_code: int, content: str):
+        """오래된 대화를 한 줄 요약으로 누적 요약에 추가"""
+        text = " ".join(content.split())
+        if len(text) > SUMMARY_LINE_CHARS:
+            text = text[:SUMMARY_LINE_CHARS] + "..."
+        line = f"{ROLE_NAMES[role_code]}: {text}"
+        summary = f"{self.summary}\n{line}" if self.summary else line
+        if len(summary) > SUMMARY_MAX_CHARS:
+            # 줄 단위로 오래된 요약부터 제거
+            summary = summary[-SUMMARY_MAX_CHARS:].split("\n", 1)[-1]
+        self.summary = summary
+
+    def messages(self) -> list:
+        """최근 대화를 OpenAI 메시지 형식으로 반환"""
+        return [
+            {"role": ROLE_NAMES[role_code], "content": content}
+            for role_code, content in self.recent
+        ]
+
+    def memory_usage(self) -> int:
+        """세션이 차지하는 대략적인 메모리 (바이트)"""
+        size = sys.getsizeof(self) + sys.getsizeof(self.recent) + sys.getsizeof(self.summary)
+        for item in self.recent:
+            size += sys.getsizeof(item) + sys.getsizeof(item[1])
+        return size
+
+    def to_bytes(self) -> bytes:
+        """디스크 저장용 압축 직렬화"""
+        data = {
+            "window": self.recent.maxlen,
+            "recent": [list(item) for item in self.recent],
+            "summary": self.summary,
+            "turn_count": self.turn_count,
+        }
+        return zlib.compress(json.dumps(data, ensure_ascii=False).encode("utf-8"))
+
+    @classmethod
+    def from_bytes(cls, raw: bytes) -> "Conversation":
+        data = json.loads(zlib.decompress(raw).decode("utf-8"))
+        conversation = cls(window=data["window"])
+        for role_code, content in data["recent"]:
+            conversation.recent.append((role_code, content))
+        conversation.summary = data["summary"]
+        conversation.turn_count = data["turn_count"]
+        return conversation
+
+
+class HistoryStore:
+    """
+    서버 전체 세션의 대화 기록 저장소.
+    일정 시간 사용하지 않은 세션은 압축해서 디스크로 내리고, 다시 접근하면 불러옴.
+    탭을 닫거나 서버가 재시작되면 세션 ID가 사라지므로, 디스크에 내린 세션은 spill_ttl_seconds 이후 삭제.
+    """
+
+    def __init__(self, spill_dir=SPILL_DIR, window=RECENT_WINDOW, idle_seconds=IDLE_SECONDS,
+                 spill_ttl_seconds=SPILL_TTL_SECONDS):
+        self.spill_dir = spill_dir
+        self.window = window
+        self.idle_seconds = idle_seconds
+        self.spill_ttl_seconds = spill_ttl_seconds
+        self.last_sweep = 0.0
+        self.last_idle_scan = 0.0
+        self.total_memory = 0  # 마지막 유휴 세션 검사 시점의 전체 세션 메모리 (바이트)
+        self.sessions = {}
+        self.spilling = {}  # 메모리에서 내렸지만 아직 파일 쓰기가 끝나지 않은 세션
+        self.lock = threading.RLock()  # Streamlit은 세션마다 별도 스레드에서 실행됨
+        self.spill_lock = threading.Lock()  # 디스크 쓰기는 한 스레드만 (self.lock과 별도)
+
+    def _spill_path(self, session_id: str) -> str:
+        return os.path.join(self.spill_dir, f"{session_id}.zlib")
+
+    def _load_spilled(self, session_id: str) -> Conversation:
+        """디스크에 내린 세션 불러오기. 없거나 손상된 파일이면 새 대화"""
+        path = self._spill_path(session_id)
+        if not os.path.exists(path):
+            return Conversation(window=self.window)
+        try:
+            with open(path, "rb") as f:
+                conversation = Conversation.from_bytes(f.read())
+        except (OSError, zlib.error, ValueError, KeyError, TypeError) as e:
+            print(f"대화 기록 파일 손상 - 새 대화로 시작: {path} ({str(e)})")
+            conversation = Conversation(window=self.window)
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        return conversation
+
+    def _write_spill(self, session_id: str, raw: bytes):
+        """임시 파일에 쓴 뒤 교체하여, 중간에 중단되어도 깨진 파일이 남지 않도록 저장"""
+        fd, tmp_path = tempfile.mkstemp(dir=self.spill_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(raw)
+            os.replace(tmp_path, self._spill_path(session_id))
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+    def get(self, session_id: str) -> Conversation:
+        """세션 대화 기록 반환 (디스크에 내려간 세션은 다시 불러옴)"""
+        with self.lock:
+            conversation = self.sessions.get(session_id)
+            if conversation is None:
+                # 파일 쓰기 중인 세션은 메모리의 객체를 그대로 되살림
+                conversation = self.spilling.pop(session_id, None) or self._load_spilled(session_id)
+                self.sessions[session_id] = conversation
+            conversation.last_access = time.time()
+            scan_due = conversation.last_access - self.last_idle_scan >= SWEEP_INTERVAL_SECONDS
+        if scan_due:
+            self.spill_idle()
+        return conversation
+
+    def append(self, session_id: str, role: str, content: str):
+        conversation = self.get(session_id)
+        with self.lock:
+            conversation.append(role, content)
+
+    def spill_idle(self) -> int:
+        """
+        유휴 세션을 디스크로 내리고 내린 세션 수를 반환. 만료된 디스크 세션도 함께 정리.
+        세션 목록 변경만 self.lock 안에서 하고, 파일 쓰기는 잠금 밖에서 수행.
+        """
+        if not self.spill_lock.acquire(blocking=False):
+            return 0  # 다른 스레드에서 이미 정리 중
+        try:
+            with self.lock:
+                now = time.time()
+                self.last_idle_scan = now
+                idle = [
+                    session_id for session_id, conversation in self.sessions.items()
+                    if now - conversation.last_access > self.idle_seconds
+                ]
+                for session_id in idle:
+                    self.spilling[session_id] = self.sessions.pop(session_id)
+                self.total_memory = sum(conversation.memory_usage() for conversation in self.sessions.values())
+                sweep_due = now - self.last_sweep >= SWEEP_INTERVAL_SECONDS
+
+            if idle:
+                os.makedirs(self.spill_dir, exist_ok=True)
+            for session_id in idle:
+                with self.lock:
+                    conversation = self.spilling.get(session_id)
+                    raw = conversation.to_bytes() if conversation is not None else None
+                if raw is None:
+                    continue  # 쓰기 전에 다시 접근된 세션
+                self._write_spill(session_id, raw)
+                with self.lock:
+                    if self.spilling.get(session_id) is conversation:
+                        del self.spilling[session_id]
+                    else:
+                        # 쓰는 동안 다시 접근되어 메모리로 돌아간 세션은 파일 삭제
+                        os.remove(self._spill_path(session_id))
+
+            if sweep_due:
+                self.sweep_expired(now)
+            return len(idle)
+        finally:
+            self.spill_lock.release()
+
+    def sweep_expired(self, now=None) -> int:
+        """수정 시각 기준으로 spill_ttl_seconds가 지난 디스크 세션 파일을 삭제하고 삭제 수를 반환"""
+        now = time.time() if now is None else now
+        self.last_sweep = now
+        if not os.path.isdir(self.spill_dir):
+            return 0
+        removed = 0
+        for name in os.listdir(self.spill_dir):
+            if not name.endswith(".zlib"):
+                continue
+            path = os.path.join(self.spill_dir, name)
+            try:
+                if now - os.path.getmtime(path) > self.spill_ttl_seconds:
+                    os.remove(path)
+                    removed += 1
+            except OSError:
+                continue  # 다른 스레드/프로세스에서 이미 불러오거나 삭제한 경우
+        return removed
+
+    def memory_usage(self) -> dict:
+        """
+        메모리에 올라와 있는 세션별 메모리 사용량 (바이트).
+        모든 세션을 순회하므로 매 요청마다 호출하지 말고, 화면 표시는 total_memory를 사용.
+        """
+        with self.lock:
+            return {
+                session_id: conversation.memory_usage()
+                for session_id, conversation in self.sessions.items()
+            }
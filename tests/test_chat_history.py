@@ -0,0 +1,115 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+import chat_history
+from chat_history import Conversation, HistoryStore
+
+
+def test_window_rollover_moves_oldest_turns_to_summary():
+    conversation = Conversation(window=3)
+    for i in range(5):
+        conversation.append("user" if i % 2 else "assistant", f"메시지 {i}")
+
+    assert [m["content"] for m in conversation.messages()] == ["메시지 2", "메시지 3", "메시지 4"]
+    assert conversation.summary == "assistant: 메시지 0\nuser: 메시지 1"
+    assert conversation.turn_count == 5
+
+
+def test_summary_line_is_truncated():
+    conversation = Conversation(window=1)
+    conversation.append("user", "가" * (chat_history.SUMMARY_LINE_CHARS + 50))
+    conversation.append("assistant", "답변")
+
+    assert conversation.summary == "user: " + "가" * chat_history.SUMMARY_LINE_CHARS + "..."
+
+
+def test_summary_is_trimmed_by_whole_lines(monkeypatch):
+    monkeypatch.setattr(chat_history, "SUMMARY_MAX_CHARS", 30)
+    conversation = Conversation(window=1)
+    for i in range(6):
+        conversation.append("user", f"질문 {i}")
+
+    assert len(conversation.summary) <= 30
+    assert conversation.summary.splitlines()[-1] == "user: 질문 4"
+    assert all(line.startswith("user: 질문 ") for line in conversation.summary.splitlines())
+
+
+def test_spill_and_reload_round_trip(tmp_path):
+    store = HistoryStore(spill_dir=str(tmp_path), window=4, idle_seconds=60)
+    for i in range(6):
+        store.append("a", "user", f"질문 {i}")
+    before = store.get("a")
+
+    before.last_access -= 120
+    assert store.spill_idle() == 1
+    assert "a" not in store.sessions
+    assert os.path.exists(tmp_path / "a.zlib")
+
+    after = store.get("a")
+    assert not os.path.exists(tmp_path / "a.zlib")
+    assert after.recent.maxlen == 4
+    assert after.turn_count == 6
+    assert after.summary == before.summary
+    assert after.messages() == before.messages()
+
+
+def test_expired_spill_files_are_removed(tmp_path):
+    store = HistoryStore(spill_dir=str(tmp_path), idle_seconds=60, spill_ttl_seconds=3600)
+    store.append("old", "user", "오래된 세션")
+    store.append("new", "user", "최근 세션")
+    store.get("old").last_access -= 120
+    store.get("new").last_access -= 120
+    store.spill_idle()
+
+    old_path = tmp_path / "old.zlib"
+    stale = time.time() - 7200
+    os.utime(old_path, (stale, stale))
+
+    assert store.sweep_expired() == 1
+    assert not os.path.exists(old_path)
+    assert os.path.exists(tmp_path / "new.zlib")
+
+
+def test_get_does_not_scan_idle_sessions_between_intervals(tmp_path):
+    store = HistoryStore(spill_dir=str(tmp_path), idle_seconds=60)
+    store.append("idle", "user", "질문")
+    store.get("idle").last_access -= 120
+
+    store.get("active")  # 직전 검사 후 SWEEP_INTERVAL_SECONDS가 지나지 않음
+    assert "idle" in store.sessions
+
+    store.last_idle_scan -= chat_history.SWEEP_INTERVAL_SECONDS
+    store.get("active")
+    assert "idle" not in store.sessions
+    assert os.path.exists(tmp_path / "idle.zlib")
+
+
+def test_spill_files_are_written_atomically(tmp_path):
+    store = HistoryStore(spill_dir=str(tmp_path), idle_seconds=60)
+    store.append("a", "user", "질문")
+    store.get("a").last_access -= 120
+    store.spill_idle()
+
+    assert sorted(os.listdir(tmp_path)) == ["a.zlib"]
+
+
+def test_corrupt_spill_file_starts_fresh_conversation(tmp_path):
+    (tmp_path / "broken.zlib").write_bytes(b"not zlib")
+    store = HistoryStore(spill_dir=str(tmp_path))
+
+    conversation = store.get("broken")
+    assert conversation.turn_count == 0
+    assert not os.path.exists(tmp_path / "broken.zlib")
+
+
+def test_session_reclaimed_while_spilling_keeps_its_history(tmp_path):
+    store = HistoryStore(spill_dir=str(tmp_path))
+    conversation = Conversation()
+    conversation.append("user", "쓰기 중인 세션")
+    store.spilling["a"] = conversation
+
+    assert store.get("a") is conversation
+    assert "a" not in store.spilling
@@ -0,0 +1,112 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+
+from pdf_layout import build_structured_texts, extract_page_layout, find_running_lines, strip_running_lines
+
+
+def make_pages(count, body):
+    """머리글 + 본문 + 쪽 번호 바닥글로 된 페이지 레이아웃"""
+    return [
+        {"lines": ["IFRS17 해설서", *body(i), f"- {i + 1} -"], "tables": []}
+        for i in range(count)
+    ]
+
+
+def test_page_number_footer_and_header_are_stripped():
+    layouts = make_pages(10, lambda i: [f"본문 첫 줄 {chr(65 + i)}", "본문 가운데", f"본문 마지막 줄 {chr(65 + i)}"])
+    running = find_running_lines(layouts)
+
+    assert "- # -" in running
+    assert strip_running_lines(layouts[4]["lines"], running) == ["본문 첫 줄 E", "본문 가운데", "본문 마지막 줄 E"]
+
+
+def test_line_repeated_below_threshold_is_kept():
+    # 10페이지 중 2페이지에만 상단에 반복되는 줄 (기준: 최소 3페이지, 30%)
+    layouts = make_pages(10, lambda i: ["제1장 총칙" if i < 2 else f"절 제목 {chr(65 + i)}", "본문", "본문 끝"])
+    running = find_running_lines(layouts)
+    texts, _ = build_structured_texts(layouts)
+
+    assert "제#장 총칙" not in running
+    assert texts[0][1].splitlines()[0] == "제1장 총칙"
+
+
+def test_short_pages_are_skipped_when_counting():
+    layouts = [{"lines": ["표지", "2024", "보험개발원", "- 1 -"], "tables": []} for _ in range(10)]
+
+    assert find_running_lines(layouts) == set()
+
+
+def test_tables_are_included_once():
+    table = ["구분 | 금액", "보험료 | 100"]
+    layouts = [{"lines": ["본문 A"], "tables": [table]}, {"lines": ["본문 B"], "tables": [table]}]
+    texts, report = build_structured_texts(layouts)
+
+    assert texts == [(1, "본문 A\n\n구분 | 금액\n보험료 | 100"), (2, "본문 B")]
+    assert report["tables"] == 1
+    assert report["duplicate_tables"] == 1
+
+
+class FakeTable:
+    def __init__(self, bbox, rows):
+        self.bbox = bbox
+        self.rows = rows
+
+    def extract(self):
+        return self.rows
+
+
+class FakePage:
+    """pdfplumber Page 대역. outside_bbox로 제외한 영역의 텍스트를 본문에서 뺌"""
+
+    def __init__(self, regions, tables, bbox=(0, 0, 600, 800)):
+        self.regions = regions  # [(bbox, text), ...]
+        self.tables = tables
+        self.bbox = bbox
+        self.excluded = []
+
+    def find_tables(self):
+        return self.tables
+
+    def outside_bbox(self, bbox, strict=True):
+        if strict and not (self.bbox[0] <= bbox[0] and self.bbox[1] <= bbox[1]
+                           and bbox[2] <= self.bbox[2] and bbox[3] <= self.bbox[3]):
+            raise ValueError("bbox is not fully within page")
+        page = FakePage(self.regions, self.tables, self.bbox)
+        page.excluded = self.excluded + [bbox]
+        return page
+
+    def extract_text(self):
+        def inside(region, bbox):
+            return bbox[0] <= region[0] and bbox[1] <= region[1] and region[2] <= bbox[2] and region[3] <= bbox[3]
+        return "\n".join(
+            text for region, text in self.regions
+            if not any(inside(region, bbox) for bbox in self.excluded)
+        )
+
+
+def test_table_rows_are_not_duplicated_in_body():
+    table_bbox = (50, 100, 550, 200)
+    page = FakePage(
+        regions=[((50, 50, 550, 90), "본문"), ((60, 110, 540, 190), "구분 금액")],
+        tables=[FakeTable(table_bbox, [["구분", "금액"], ["보험료", None]])],
+    )
+    layout = extract_page_layout(page)
+
+    assert layout["lines"] == ["본문"]
+    assert layout["tables"] == [["구분 | 금액", "보험료 | "]]
+
+
+def test_table_bbox_outside_page_is_clipped_and_empty_bbox_skipped():
+    page = FakePage(
+        regions=[((50, 50, 550, 90), "본문"), ((60, 110, 590, 190), "표 내용")],
+        tables=[
+            FakeTable((40, 100, 620, 200), [["표", "내용"]]),  # 오른쪽 괘선이 페이지 밖
+            FakeTable((100, 300, 100, 400), [["빈", "영역"]]),  # 면적 0
+        ],
+    )
+    layout = extract_page_layout(page)
+
+    assert layout["lines"] == ["본문"]
+    assert layout["tables"] == [["표 | 내용"]]